@@ -1,5 +1,7 @@
 # File: app.py
 
+from functools import partial
+
 import streamlit as st
 from tiller_streamlit import (
     get_transaction_data_df,
@@ -13,8 +15,8 @@ from tiller_streamlit import (
     plot_comparative_spending,
     get_balance_history,
     resampled_balance_history,
-    plot_net_worth_over_time,
-    plot_monthly_total_and_account_balances,
+    plot_net_worth_combined,
+    prewarm,
 )
 
 
@@ -54,9 +56,21 @@ def main():
 
     # Fetch transaction data once to use across multiple plots
     transaction_data = get_transaction_data_df()
-    categories = sorted(transaction_data["Category"].unique())
+    # Category is categorical, so its categories are already unique and sorted
+    categories = list(transaction_data["Category"].cat.categories)
+
+    # These plots take no widget input, so build them in the background while
+    # the sections above them render; their sections then hit the cache
+    prewarm(
+        "widget-free",
+        [
+            partial(plot_spending_per_subcategory, transaction_data),
+            partial(plot_monthly_income, transaction_data),
+        ],
+    )
 
-    # Plot Sections
+    # Plot Sections; sections with widgets are fragments, so a widget change
+    # reruns only its own section
     plot_net_worth_section(transaction_data, header)
     plot_monthly_spending_by_category_section(transaction_data, categories, header)
     plot_monthly_spending_section(transaction_data, categories, header)
@@ -81,13 +95,11 @@ def plot_net_worth_section(transaction_data, header_func):
     header_func("Net worth over time")
     df_balance_history = get_balance_history()
     df_nw = resampled_balance_history(df_balance_history)
-    fig1 = plot_monthly_total_and_account_balances(df_nw)
-    st.plotly_chart(fig1, use_container_width=True)
-
-    fig2 = plot_net_worth_over_time(df_nw)
-    st.plotly_chart(fig2, use_container_width=True)
+    fig = plot_net_worth_combined(df_nw)
+    st.plotly_chart(fig, use_container_width=True)
 
 
+@st.fragment
 def plot_monthly_comparative_spending_section(transaction_data, header_func):
     """
     Renders the "Monthly Comparative Spending" section.
@@ -97,13 +109,25 @@ def plot_monthly_comparative_spending_section(transaction_data, header_func):
         header_func (function): Function to set headers.
     """
     header_func("Monthly Comparative Spending")
+    options = [1, 2, 3, 4, 5, 6]
     months_to_compare = st.selectbox(
-        "Compare with previous n months:", [1, 2, 3, 4, 5, 6], index=2
+        "Compare with previous n months:", options, index=2
     )
-    fig = plot_comparative_spending(transaction_data, months_to_compare)
+    fig = plot_comparative_spending(transaction_data, n_last_months=months_to_compare)
     st.altair_chart(fig, use_container_width=True)
 
+    # Build the other choices in the background so switching is instant
+    prewarm(
+        "comparative",
+        (
+            partial(plot_comparative_spending, transaction_data, n_last_months=n)
+            for n in options
+            if n != months_to_compare
+        ),
+    )
+
 
+@st.fragment
 def plot_monthly_spending_by_category_section(
     transaction_data, categories, header_func
 ):
@@ -146,6 +170,7 @@ def plot_monthly_spending_by_category_section(
     st.plotly_chart(fig, use_container_width=True)
 
 
+@st.fragment
 def plot_monthly_spending_section(transaction_data, categories, header_func):
     """
     Renders the "Monthly Spending" section.
@@ -177,6 +202,7 @@ def plot_monthly_spending_section(transaction_data, categories, header_func):
     st.plotly_chart(fig, use_container_width=True)
 
 
+@st.fragment
 def plot_histogram_section(transaction_data, categories, header_func):
     """
     Renders the "Histogram of amount per category" section.
@@ -196,6 +222,7 @@ def plot_histogram_section(transaction_data, categories, header_func):
     st.plotly_chart(fig, use_container_width=True)
 
 
+@st.fragment
 def plot_spending_by_subcategory_section(transaction_data, categories, header_func):
     """
     Renders the "Spending by Subcategory" section.
@@ -232,6 +259,7 @@ def plot_monthly_income_section(transaction_data, header_func):
     st.plotly_chart(fig, use_container_width=True)
 
 
+@st.fragment
 def plot_total_spending_pie_chart_section(transaction_data, header_func):
     """
     Renders the "Total Spending Pie Chart" section.
@@ -243,7 +271,7 @@ def plot_total_spending_pie_chart_section(transaction_data, header_func):
     header_func("Total Spending Pie Chart")
     year = st.selectbox(
         "Select a year",
-        [None] + sorted(transaction_data["Date"].dt.year.unique(), reverse=True),
+        [None] + transaction_data.attrs["years"],
     )
     month = st.selectbox("Select a month", [None] + list(range(1, 13)))
     with_group = st.checkbox("Group by category", value=False, key="pie_group")
@@ -1,163 +1,319 @@
 import calendar
+import logging
 import os
+import weakref
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from typing import TYPE_CHECKING
 
-import altair as alt
-import matplotlib
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import plotly
 import plotly.express as px
+import plotly.graph_objects as go
+import streamlit as st
 from dotenv import load_dotenv
 from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
+from plotly.subplots import make_subplots
+
+if TYPE_CHECKING:
+    import altair as alt
+    import matplotlib.figure
 
 load_dotenv()
 
+_LOGGER = logging.getLogger(__name__)
+
 SERVICE_ACCOUNT_FILE = os.environ["SERVICE_ACCOUNT_FILE"]
 SCOPES = os.environ["SCOPES"].split(",")
 SPREADSHEET_ID = os.environ["SPREADSHEET_ID"]
 
+# Categories that move money around rather than spend it
+_NON_SPENDING = frozenset(
+    {"Investments in Stocks", "Investments in Crypto", "Credit Card Payment"}
+)
 
-def get_sheet(range: str) -> dict:
+# Categories left out of the month-over-month cumulative spending comparison
+_NOT_COMPARED = frozenset(
+    {"Paycheck", "Investments in Stocks", "Investments in Crypto"}
+)
+
+# Plot and spending caches key the transaction frame on a content fingerprint,
+# taken once per frame object rather than on every cached call
+_PLOT_HASH_FUNCS = {pd.DataFrame: lambda df: _cache_key(df)}
+
+# Fingerprints by frame id, each beside a weak reference to its frame so that an
+# id reused by a later frame is never mistaken for the one that was hashed
+_FINGERPRINTS: dict[int, tuple[weakref.ref, tuple[int, int, tuple[str, ...]]]] = {}
+
+# Builds figures the user is likely to ask for next, off the script thread
+_PREWARM_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prewarm")
+
+# Day zero of Google Sheets' serial date numbers
+_SHEETS_EPOCH = "1899-12-30"
+
+
+# Sheets fetched together in a single batchGet round trip
+_BATCHED_SHEETS = ("Transactions", "Balance History", "Categories")
+
+# Ask for raw numbers and serial dates so nothing has to parse "$3,200.00"
+_RENDER_OPTIONS = dict(
+    valueRenderOption="UNFORMATTED_VALUE", dateTimeRenderOption="SERIAL_NUMBER"
+)
+
+
+@st.cache_resource
+def _sheets_service():
+    # Built once per process, so googleapiclient's own discovery cache is redundant
     credentials = Credentials.from_service_account_file(
         SERVICE_ACCOUNT_FILE, scopes=SCOPES
     )
-    service = build("sheets", "v4", credentials=credentials)
-    sheet = service.spreadsheets()  # Call the Sheets API
-    return sheet.values().get(spreadsheetId=SPREADSHEET_ID, range=range).execute()
+    service = build("sheets", "v4", credentials=credentials, cache_discovery=False)
+    return service.spreadsheets()  # Call the Sheets API
+
+
+# Every sheet the app reads comes through _fetch_sheets, so this cache only serves
+# ranges outside _BATCHED_SHEETS, such as ones read from the notebook
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_sheet(range: str) -> dict:
+    return (
+        _sheets_service()
+        .values()
+        .get(spreadsheetId=SPREADSHEET_ID, range=range, **_RENDER_OPTIONS)
+        .execute()
+    )
+
+
+def get_sheets(ranges: list[str]) -> dict[str, list[list]]:
+    result = (
+        _sheets_service()
+        .values()
+        .batchGet(spreadsheetId=SPREADSHEET_ID, ranges=ranges, **_RENDER_OPTIONS)
+        .execute()
+    )
+    # valueRanges come back in request order, with ranges like "'Sheet'!A1:Z9"
+    return {r: vr["values"] for r, vr in zip(ranges, result["valueRanges"])}
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _fetch_sheets() -> dict[str, list[list]]:
+    return get_sheets(list(_BATCHED_SHEETS))
 
 
 def sheet_as_df(range: str) -> pd.DataFrame:
-    values = get_sheet(range)["values"]
+    if range in _BATCHED_SHEETS:
+        values = _fetch_sheets()[range]
+    else:  # Not reached by the app; kept for reading other ranges
+        values = get_sheet(range)["values"]
     return pd.DataFrame(values[1:], columns=values[0])
 
 
-def get_categories() -> tuple[dict[str, str], dict[str, list[str]]]:
+def prewarm(batch: str, calls: Iterable[Callable[[], object]]) -> None:
+    # Run cached plot calls in the background, so switching a widget with a
+    # small fixed set of values is a cache hit. Build each call with
+    # functools.partial exactly as the app makes it, since that is the cache key.
+    # Each rerun submits its batch again, so first cancel whatever of the previous
+    # batch under this name hasn't started, rather than letting the queue grow.
+    # The pool serves every session, so each tracks only its own batches.
+    key = f"_prewarm_{batch}"
+    for future in st.session_state.get(key, []):
+        future.cancel()
+    futures = [_PREWARM_POOL.submit(call) for call in calls]
+    for future in futures:
+        future.add_done_callback(_log_prewarm_failure)
+    st.session_state[key] = futures
+
+
+def _log_prewarm_failure(future: Future) -> None:
+    # Nothing waits on a prewarm result, so report failures here or they are lost
+    if not future.cancelled() and future.exception() is not None:
+        _LOGGER.warning("Prewarming a plot failed", exc_info=future.exception())
+
+
+def _fingerprint(df: pd.DataFrame) -> tuple[int, int, tuple[str, ...]]:
+    # Changes with any edit to a transaction's date, category, group or amount, and
+    # with which categories count as spending
+    hashed = pd.util.hash_pandas_object(
+        df[["Date", "Category", "Group", "Amount"]], index=False
+    )
+    return len(df), int(hashed.sum()), tuple(df.attrs.get("spending_categories", ()))
+
+
+def _cache_key(df: pd.DataFrame) -> tuple[int, int, tuple[str, ...]]:
+    # Reuse a fingerprint only for the very frame it was taken from. Frames derived
+    # from it are new objects, so any edit, whatever its shape, is hashed afresh.
+    # st.cache_data hands each run its own copy, so this hashes once per run.
+    key = id(df)
+    entry = _FINGERPRINTS.get(key)
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+    fingerprint = _fingerprint(df)
+    ref = weakref.ref(df, lambda _: _FINGERPRINTS.pop(key, None))
+    _FINGERPRINTS[key] = (ref, fingerprint)
+    return fingerprint
+
+
+def serial_to_datetime(serial: pd.Series) -> pd.Series:
+    return pd.to_datetime(pd.to_numeric(serial), unit="D", origin=_SHEETS_EPOCH)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_categories() -> tuple[dict[str, str], dict[str, list[str]], dict[str, str]]:
     df = sheet_as_df("Categories")
-    category_to_group: dict[str, str] = {}
-    group_to_category: dict[str, list[str]] = {}
-    category_to_type: dict[str, str] = {}
-
-    for i, row in df.iterrows():
-        category_to_group[row.Category] = row.Group
-        category_to_type[row.Category] = row.Type
-        group_to_category.setdefault(row.Group, []).append(row.Category)
+    categories = df["Category"].to_numpy()
+    category_to_group = dict(zip(categories, df["Group"].to_numpy()))
+    category_to_type = dict(zip(categories, df["Type"].to_numpy()))
+    group_to_category = (
+        df.groupby("Group", sort=False, dropna=False)["Category"].agg(list).to_dict()
+    )
     return category_to_group, group_to_category, category_to_type
 
 
-def _add_category_group(transaction_data: pd.DataFrame) -> pd.DataFrame:
-    category_to_group, group_to_category, category_to_type = get_categories()
-    transaction_data["Group"] = transaction_data["Category"].apply(
-        lambda x: category_to_group.get(x, "")
+@st.cache_data(ttl=3600, show_spinner="Loading transactions…")
+def get_transaction_data_df() -> pd.DataFrame:
+    df = sheet_as_df("Transactions")
+    # Low-cardinality text columns are grouped and filtered on constantly
+    for col in ("Category", "Description", "Account"):
+        if col in df:
+            df[col] = df[col].astype("category")
+    # Kept in date order so the monthly resamples run on sorted timestamps
+    df["Date"] = serial_to_datetime(df["Date"])
+    df = df.sort_values("Date", ignore_index=True)
+    df["Amount"] = clean_amount(df["Amount"])
+
+    category_to_group, _, category_to_type = get_categories()
+    # Mapping a categorical can give back a categorical, which rejects the "" fill,
+    # so fill as plain values and then make the low-cardinality result categorical
+    category = df["Category"]
+    df["Group"] = (
+        category.map(category_to_group).astype(object).fillna("").astype("category")
     )
-    transaction_data["Type"] = transaction_data["Category"].apply(
-        lambda x: category_to_type.get(x, "")
+    df["Type"] = (
+        category.map(category_to_type).astype(object).fillna("").astype("category")
     )
-    return transaction_data
 
+    # Spending categories net out negative and are neither transfers nor
+    # investments. Each test is per category, so decide them all here, once
+    category_totals = df.groupby("Category", observed=True, sort=False)["Amount"].sum()
+    categories = category_totals.index
+    is_transfer = categories.map(category_to_type) == "Transfer"
+    is_spending = (category_totals < 0) & ~is_transfer & ~categories.isin(_NON_SPENDING)
+    # A plain list, since attrs follow derived frames into Streamlit's Arrow
+    # conversion, which stores them as JSON
+    df.attrs["spending_categories"] = categories[is_spending].tolist()
 
-def get_transaction_data_df() -> pd.DataFrame:
-    df = sheet_as_df("Transactions")
-    df["Date"] = pd.to_datetime(df["Date"])
-    df["Amount"] = df["Amount"].apply(clean_amount)
-    _add_per_category_amount(df)
-    _add_category_group(df)
     df["month_year"] = df["Date"].dt.to_period("M")
+    df.attrs["years"] = sorted(df["Date"].dt.year.unique().tolist(), reverse=True)
     return df
 
 
-#def clean_amount(x: str) -> float:
-    # change e.g., $3,200.00 to 3200.00 in Amount column
-#    return float(x.replace("$", "").replace(",", ""))
-
-def clean_amount(x):
-    # Check if the string is empty or contains only spaces
-    if x.strip() == '':
-        return 0.0  # Return a default value, e.g., 0.0
-    return float(x.replace("$", "").replace(",", ""))
-
-
-def _add_per_category_amount(transaction_data: pd.DataFrame) -> pd.DataFrame:
-    gb = transaction_data.groupby(["Category"])["Amount"].sum().reset_index()
-    for i, row in transaction_data.iterrows():
-        sel = gb["Category"] == row["Category"]
-        transaction_data.loc[i, "amount_category"] = gb[sel].Amount.item()
+def clean_amount(amount: pd.Series) -> pd.Series:
+    # Amounts arrive as numbers; empty cells come back as "" and become 0.0
+    return pd.to_numeric(amount, errors="coerce").fillna(0.0)
 
 
 def _to_spending(transaction_data: pd.DataFrame) -> pd.DataFrame:
-    df = transaction_data[transaction_data.amount_category < 0].copy()
-    df = df[
-        (df["Type"] != "Transfer")
-        & (df["Category"] != "Investments in Stocks")
-        & (df["Category"] != "Investments in Crypto")
-        & (df["Category"] != "Credit Card Payment")
+    # Only read through the cached _monthly_spending, so it copies just the columns
+    # the spending plots aggregate, and needs no cache of its own
+    df = transaction_data.loc[
+        transaction_data["Category"].isin(
+            transaction_data.attrs["spending_categories"]
+        ),
+        ["Date", "month_year", "Category", "Amount"],
     ]
-    df["amount_pct"] = df["Amount"] / df["Amount"].sum() * 100
-    total = df["Amount"].sum()
-    df["amount_category_pct"] = df["amount_category"] / total * 100
-    df["Amount"] = -df["Amount"]
+    df["Amount"] = -df["Amount"].to_numpy()
     return df
 
 
+@st.cache_data(ttl=3600, max_entries=4, hash_funcs=_PLOT_HASH_FUNCS, show_spinner=False)
+def _monthly_spending(transaction_data: pd.DataFrame) -> pd.DataFrame:
+    # One (month x category) table of spending sums shared by the monthly plots;
+    # categories without spending in a month are NaN there, not 0
+    return _to_spending(transaction_data).pivot_table(
+        index="month_year",
+        columns="Category",
+        values="Amount",
+        aggfunc="sum",
+        observed=True,
+    )
+
+
+@st.cache_data(ttl=3600, show_spinner="Loading balance history…")
 def get_balance_history() -> pd.DataFrame:
     df = sheet_as_df("Balance History")
-    df["Balance"] = df.Balance.str.replace(",", "").str.replace("$", "").astype(float)
-    df["Date"] = pd.to_datetime(df["Date"])
+    for col in ("Account ID", "Account", "Class"):
+        if col in df:
+            df[col] = df[col].astype("category")
+    df["Balance"] = pd.to_numeric(df["Balance"]).astype(float)
+    df["Date"] = serial_to_datetime(df["Date"])
     return df
 
 
+@st.cache_data(ttl=3600, show_spinner=False)
 def resampled_balance_history(df: pd.DataFrame) -> pd.DataFrame:
     # Resolve duplicates by taking the last snapshot for each day for each account
     df_ = df.drop_duplicates(subset=["Account ID", "Date"], keep="last")
 
-    # Sort by 'Account ID' and 'Date'
-    df_ = df_.sort_values(by=["Account ID", "Date"])
     df_.loc[df_["Class"] == "Liability", "Balance"] *= -1
 
     # Extend the DataFrame to include the current date for each account
     current_date = pd.to_datetime("today").normalize()  # Normalize to remove time
     idx = pd.date_range(start=df_["Date"].min(), end=current_date, freq="D")
-    df_ = df_.set_index("Date")
-
-    # Function to process each group
-    def process_group(group):
-        group = group.reindex(idx)  # Reindex without filling
-        # Forward fill the non-balance columns if there are any
-        non_balance_columns = group.drop(columns=["Balance"]).columns
-        group[non_balance_columns] = (
-            group[non_balance_columns].infer_objects(copy=False).ffill().bfill()
-        )
-        # Interpolate the 'Balance' column
-        group["Balance"] = group["Balance"].interpolate(
-            method="linear", limit_direction="forward"
-        )
-        group["Balance"] = group["Balance"].fillna(0)
-        return group
 
-    # Apply the function to each account group
-    df_processed = df_.groupby("Account ID", group_keys=True).apply(
-        process_group, include_groups=False
+    # Reindex every account onto the same daily grid in one go (without filling)
+    accounts = sorted(df_["Account ID"].dropna().unique())
+    grid = pd.MultiIndex.from_product([accounts, idx], names=["Account ID", "Date"])
+    df_ = df_.set_index(["Account ID", "Date"]).reindex(grid)
+
+    # Forward fill, then back fill, the non-balance columns within each account
+    non_balance_columns = df_.columns.drop("Balance")
+    df_[non_balance_columns] = (
+        df_[non_balance_columns]
+        .infer_objects(copy=False)
+        .groupby(level="Account ID", observed=True, sort=False)
+        .ffill()
+        .groupby(level="Account ID", observed=True, sort=False)
+        .bfill()
     )
 
-    # Reset index to bring 'Date' back as a column
-    df_processed.reset_index(inplace=True)
-    df_processed["Date"] = df_processed.pop("level_1")
+    # Interpolate the balances with one account per column
+    balances = df_["Balance"].unstack("Account ID")
+    balances = balances.interpolate(method="linear", limit_direction="forward")
+    df_["Balance"] = balances.fillna(0).unstack()
+
+    # Reset index to bring 'Account ID' and 'Date' back as columns
+    df_processed = df_.reset_index()
+    df_processed["Date"] = df_processed.pop("Date")
     return df_processed
 
 
+@st.cache_data(
+    ttl=3600, max_entries=32, hash_funcs=_PLOT_HASH_FUNCS, show_spinner=False
+)
 def plot_categories(
     transaction_data: pd.DataFrame,
     month: int | None = None,
     year: int | None = None,
     with_group: bool = False,
 ) -> plotly.graph_objs.Figure:
-    df = _to_spending(transaction_data)
+    monthly = _monthly_spending(transaction_data)
+    # Each category's share of all spending, whatever months are shown
+    category_totals = monthly.sum()
+    percent = (category_totals / category_totals.sum() * 100).map("{:.2f}%".format)
     if month is not None:
-        df = df[df["Date"].dt.month == month]
+        monthly = monthly[monthly.index.month == month]
     if year is not None:
-        df = df[df["Date"].dt.year == year]
-    df["Percent"] = df["amount_category_pct"].apply(lambda x: f"{x:.2f}%")
+        monthly = monthly[monthly.index.year == year]
+
+    # The sunburst sums its slices itself, so monthly totals give the same picture
+    # as individual transactions from far fewer rows
+    df = monthly.stack().dropna().rename("Amount").reset_index()
+    df["Percent"] = df["Category"].map(percent)
+    if with_group:
+        category_to_group = get_categories()[0]
+        df["Group"] = df["Category"].map(category_to_group).astype(object).fillna("")
     path = ["Category"] if not with_group else ["Group", "Category"]
     return px.sunburst(
         df,
@@ -168,29 +324,43 @@ def plot_categories(
 
 
 def single_category(
-    transaction_data: pd.DataFrame, category: str = "Groceries"
+    transaction_data: pd.DataFrame, category: str = "Groceries", sort: bool = True
 ) -> pd.DataFrame:
-    return transaction_data[(transaction_data["Category"] == category)].sort_values(
-        "Amount"
-    )[["Description", "Date", "Amount"]]
+    # Select the shown columns before sorting so only those are reordered
+    df = transaction_data.loc[
+        transaction_data["Category"] == category, ["Description", "Date", "Amount"]
+    ]
+    # Binning and monthly sums don't care about order, so those callers skip the sort
+    return df.sort_values("Amount") if sort else df
 
 
+@st.cache_data(
+    ttl=3600, max_entries=32, hash_funcs=_PLOT_HASH_FUNCS, show_spinner=False
+)
 def plot_category_histogram(
     transaction_data: pd.DataFrame, category: str = "Groceries", nbins: int = 30
 ) -> plotly.graph_objs.Figure:
-    cat = single_category(transaction_data, category)
-    fig = px.histogram(cat, x="Amount", nbins=nbins)
+    cat = single_category(transaction_data, category, sort=False)
+    # Bin in numpy and ship only the bin counts, not every raw amount
+    counts, edges = np.histogram(cat["Amount"].to_numpy(), bins=nbins)
+    fig = go.Figure(
+        go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges))
+    )
     fig.update_layout(
         title=category.capitalize(),
         xaxis_title="Amount",
         yaxis_title="Frequency",
+        bargap=0,
     )
     return fig
 
 
+@st.cache_data(
+    ttl=3600, max_entries=32, hash_funcs=_PLOT_HASH_FUNCS, show_spinner=False
+)
 def plot_monthly_income(transaction_data: pd.DataFrame) -> plotly.graph_objs.Figure:
     df = (
-        single_category(transaction_data, "Paycheck")
+        single_category(transaction_data, "Paycheck", sort=False)
         .set_index("Date")
         .groupby(pd.Grouper(freq="ME"))["Amount"]
         .sum()
@@ -200,38 +370,58 @@ def plot_monthly_income(transaction_data: pd.DataFrame) -> plotly.graph_objs.Fig
     return fig
 
 
+@st.cache_data(
+    ttl=3600, max_entries=32, hash_funcs=_PLOT_HASH_FUNCS, show_spinner=False
+)
 def plot_spending_per_subcategory(transaction_data) -> plotly.graph_objs.Figure:
-    df = _to_spending(transaction_data)
-
-    df["Date"] = pd.to_datetime(df["Date"]).dt.to_period("M").astype(str)
-    df = df.groupby(["Date", "Category"])["Amount"].sum().reset_index()
-    fig = px.line(
-        df,
-        x="Date",
-        y="Amount",
-        color="Category",
+    # One column per category, months without spending filled with 0
+    pivot = _monthly_spending(transaction_data).fillna(0)
+    months = pivot.index.strftime("%Y-%m")
+    fig = go.Figure(
+        [
+            go.Scatter(x=months, y=pivot[category], name=str(category), mode="lines")
+            for category in pivot.columns
+        ]
+    )
+    fig.update_layout(
         title="Monthly Spending by Subcategory",
+        xaxis_title="Date",
+        yaxis_title="Amount",
+        legend_title="Category",
     )
     return fig
 
 
+@st.cache_data(
+    ttl=3600, max_entries=32, hash_funcs=_PLOT_HASH_FUNCS, show_spinner=False
+)
 def plot_single_category_by_month_plotly(
     transaction_data, category: str = "Shopping"
 ) -> plotly.graph_objs.Figure:
-    df = transaction_data
-    df = df[df["Category"] == category]
-    df["Date"] = pd.to_datetime(df["Date"]).dt.to_period("M").astype(str)
-    df = df.groupby(["Date"])["Amount"].sum().reset_index()
+    # Select just the needed columns so the cached frame is never written to
+    df = (
+        transaction_data.loc[
+            transaction_data["Category"] == category, ["Date", "Amount"]
+        ]
+        .resample("MS", on="Date")["Amount"]
+        .sum()
+        .reset_index()
+    )
+    df["Date"] = df["Date"].dt.strftime("%Y-%m")
     fig = px.bar(df, x="Date", y="Amount", title=f"Monthly Spending by {category}")
     return fig
 
 
 def plot_single_category_by_month(
     df: pd.DataFrame, category: str = "Groceries"
-) -> matplotlib.figure.Figure:
-    groceries = single_category(df, category)
-    groceries["month_year"] = groceries["Date"].dt.to_period("M")
-    df_grouped = groceries.groupby("month_year")["Amount"].sum()
+) -> "matplotlib.figure.Figure":
+    # The only matplotlib plot, so pyplot is imported on first use, not at app start
+    import matplotlib.pyplot as plt
+
+    groceries = single_category(df, category, sort=False)
+    # Reuse the month periods computed at load for just this category's rows
+    month_year = df.loc[groceries.index, "month_year"]
+    df_grouped = groceries.groupby(month_year)["Amount"].sum()
 
     # Plot a histogram
     fig, ax = plt.subplots(figsize=(10, 6))
@@ -242,6 +432,9 @@ def plot_single_category_by_month(
     return fig
 
 
+@st.cache_data(
+    ttl=3600, max_entries=32, hash_funcs=_PLOT_HASH_FUNCS, show_spinner=False
+)
 def plot_categories_per_month(
     transaction_data: pd.DataFrame,
     skip_categories: list[str] | None = None,
@@ -261,16 +454,19 @@ def plot_categories_per_month(
         plotly.graph_objs.Figure: The resulting Plotly figure.
     """
     # Prepare the data
-    df = _to_spending(transaction_data)
+    monthly = _monthly_spending(transaction_data)
     if skip_categories:
-        df = df[~df["Category"].isin(skip_categories)]
-
-    # Convert Date to monthly timestamp (start of the month) and sort
-    df["Date"] = pd.to_datetime(df["Date"]).dt.to_period("M").dt.to_timestamp()
-    df = df.sort_values("Date")
-
-    # Aggregate spending per month and category
-    df_grouped = df.groupby(["Date", "Category"])["Amount"].sum().reset_index()
+        monthly = monthly.drop(columns=skip_categories, errors="ignore")
+
+    # Spending per month (as start-of-month timestamps) and category, in long form,
+    # keeping only the pairs that had transactions
+    df_grouped = (
+        monthly.set_axis(monthly.index.to_timestamp().rename("Date"))
+        .stack()
+        .dropna()
+        .rename("Amount")
+        .reset_index()
+    )
 
     plot_title = "Monthly Spending by Category"
 
@@ -295,8 +491,11 @@ def plot_categories_per_month(
         df_grouped = df_grouped.sort_values(["Category", "Date"])
 
         # Calculate the moving average per Category
-        df_grouped["Moving_Avg"] = df_grouped.groupby("Category")["Amount"].transform(
-            lambda x: x.rolling(window=n_months_ma, min_periods=1).mean()
+        df_grouped["Moving_Avg"] = (
+            df_grouped.groupby("Category", observed=True, sort=False)["Amount"]
+            .rolling(window=n_months_ma, min_periods=1)
+            .mean()
+            .reset_index(level=0, drop=True)
         )
 
         # Replace 'Amount' with 'Moving_Avg' for plotting
@@ -309,7 +508,9 @@ def plot_categories_per_month(
 
     # Calculate total spending per category to determine stacking order
     total_spending_per_category = (
-        df_grouped.groupby("Category")["Amount"].sum().sort_values(ascending=False)
+        df_grouped.groupby("Category", observed=True, sort=False)["Amount"]
+        .sum()
+        .sort_values(ascending=False)
     )
     sorted_categories = total_spending_per_category.index.tolist()
 
@@ -336,27 +537,30 @@ def plot_categories_per_month(
     return fig
 
 
+@st.cache_data(
+    ttl=3600, max_entries=32, hash_funcs=_PLOT_HASH_FUNCS, show_spinner=False
+)
 def plot_total_spending_per_month(
     transaction_data: pd.DataFrame,
     skip_categories: list[str] | None = None,
     n_months_moving_avg: list[int] = [3],
 ) -> plotly.graph_objs.Figure:
     # Filter and process spending data
-    df = _to_spending(transaction_data)
+    monthly = _monthly_spending(transaction_data)
     if skip_categories:
-        df = df[~df["Category"].isin(skip_categories)]
-
-    # Convert the Date column to a monthly period (without converting to string)
-    df["Date"] = pd.to_datetime(df["Date"]).dt.to_period("M")
-
-    # Group by month and calculate the total spending per month
-    df_monthly = df.groupby("Date")["Amount"].sum().reset_index()
-
-    # Sort by date to ensure correct moving average calculation
-    df_monthly = df_monthly.sort_values(by="Date")
-
-    # Convert Period to string for Plotly
-    df_monthly["Date"] = df_monthly["Date"].astype(str)
+        monthly = monthly.drop(columns=skip_categories, errors="ignore")
+
+    # Total spending per month from the first to the last month with any, with
+    # months in between that had none as 0, then format the months for Plotly
+    totals = monthly.sum(axis=1, min_count=1).dropna()
+    if not totals.empty:
+        totals = totals.reindex(
+            pd.period_range(totals.index.min(), totals.index.max(), freq="M"),
+            fill_value=0,
+        )
+    df_monthly = pd.DataFrame(
+        {"Date": totals.index.strftime("%Y-%m"), "Amount": totals.to_numpy()}
+    )
 
     # Identify the last month in the data
     last_month = df_monthly["Date"].max()
@@ -369,22 +573,21 @@ def plot_total_spending_per_month(
     if last_month == current_month:
         df_monthly_no_incomplete = df_monthly[df_monthly["Date"] != last_month]
     else:
-        df_monthly_no_incomplete = df_monthly.copy()
+        df_monthly_no_incomplete = df_monthly
 
     # Create the bar plot for monthly spending
     fig = px.bar(df_monthly, x="Date", y="Amount", title="Monthly Spending")
 
     # Loop through each value in the n_months_moving_avg list and compute the moving average
     for n_months in n_months_moving_avg:
-        # Calculate the moving average for the current n_months, excluding incomplete months
+        # Calculate the moving average for the current n_months, excluding incomplete months;
+        # it is plotted straight from the Series, so the frame is never copied
         avg = df_monthly_no_incomplete["Amount"].rolling(window=n_months).mean()
-        df_monthly_no_incomplete = df_monthly_no_incomplete.copy()
-        df_monthly_no_incomplete[f"Moving_Avg_{n_months}"] = avg
 
         # Add a line for the current moving average
         fig.add_scatter(
             x=df_monthly_no_incomplete["Date"],
-            y=df_monthly_no_incomplete[f"Moving_Avg_{n_months}"],
+            y=avg,
             mode="lines",
             name=f"{n_months}-Month Moving Average",
             line=dict(width=2),  # You can customize colors here if desired
@@ -401,27 +604,43 @@ def plot_total_spending_per_month(
     return fig
 
 
-def plot_comparative_spending(df: pd.DataFrame, n_last_months: int = 3) -> alt.Chart:
-    df = df[df["Category"] != "Paycheck"]
-    df = df[df["Category"] != "Investments in Stocks"]
-    df = df[df["Category"] != "Investments in Crypto"]
-    df["Amount"] = -df["Amount"]
+@st.cache_data(
+    ttl=3600, max_entries=32, hash_funcs=_PLOT_HASH_FUNCS, show_spinner=False
+)
+def plot_comparative_spending(df: pd.DataFrame, n_last_months: int = 3) -> "alt.Chart":
+    # Streamlit does not import altair itself, so load it with the only chart using it
+    import altair as alt
 
-    df_ = df.groupby(df["Date"].dt.date)["Amount"].sum().reset_index()
-    df_["Date"] = pd.to_datetime(df_["Date"])
-    df_["day"] = df_["Date"].dt.day
-    df_["cumsum"] = df_.groupby(df_["Date"].dt.to_period("M"))["Amount"].cumsum()
+    df = df[~df["Category"].isin(_NOT_COMPARED)]
+
+    # Only the last n_last_months are drawn, so drop older transactions up front,
+    # keeping the whole earliest month so its running total starts from day one
+    cutoff = df["Date"].max().normalize() - pd.DateOffset(months=n_last_months)
+    df = df[df["Date"] >= cutoff.replace(day=1)]
+
+    # Negate on the way into the daily sums rather than writing to the filtered rows;
+    # normalizing keeps the day keys as datetimes, so they need no re-parsing
+    df_ = (-df["Amount"]).groupby(df["Date"].dt.normalize()).sum().reset_index()
+    month = df_["Date"].dt.to_period("M")
+    df_["cumsum"] = df_.groupby(month)["Amount"].cumsum()
+    most_recent_month = month.max()
 
-    most_recent_month = df_["Date"].dt.to_period("M").max()
-    df_["Relative Month"] = (most_recent_month - df_["Date"].dt.to_period("M")).apply(
-        lambda x: f"{x.n} months ago"
+    df_ = df_[df_["Date"] >= cutoff]
+    df_["day"] = df_["Date"].dt.day
+    # Count months as year * 12 + month so the offsets come from integer arithmetic
+    months_ago = (most_recent_month.year * 12 + most_recent_month.month) - (
+        df_["Date"].dt.year * 12 + df_["Date"].dt.month
     )
-    df_["Relative Month"] += ", " + df_["Date"].dt.strftime("%Y-%m")
     this_month_str = f"This Month, {most_recent_month.strftime('%Y-%m')}"
-    df_.loc[df_["Relative Month"].str.contains("0 months ago"), "Relative Month"] = (
+    # Only a handful of months are drawn, so label each distinct offset once
+    offsets, codes = np.unique(months_ago.to_numpy(), return_inverse=True)
+    labels = [
         this_month_str
-    )
-    df_ = df_[df_["Date"] >= df_["Date"].max() - pd.DateOffset(months=n_last_months)]
+        if offset == 0
+        else f"{offset} months ago, {(most_recent_month - offset).strftime('%Y-%m')}"
+        for offset in offsets
+    ]
+    df_["Relative Month"] = np.array(labels)[codes]
 
     chart = (
         alt.Chart(df_[["day", "cumsum", "Relative Month"]])
@@ -473,24 +692,28 @@ def plot_monthly_total_and_account_balances(
     if skip_accounts:
         balance_data = balance_data[~balance_data["Account"].isin(skip_accounts)]
 
-    # Convert 'Date' to 'Month' in YYYY-MM format
-    balance_data["Month"] = (
-        pd.to_datetime(balance_data["Date"]).dt.to_period("M").astype(str)
-    )
+    # Group on monthly periods, as a key rather than a new column; only the grouped
+    # months are formatted as YYYY-MM strings below
+    month = balance_data["Date"].dt.to_period("M").rename("Month")
 
     # Group by 'Month' and 'Account', taking the first balance (assuming one entry per group)
-    df = balance_data.groupby(["Month", "Account"])["Balance"].first().reset_index()
+    df = (
+        balance_data.groupby([month, "Account"], observed=True)["Balance"]
+        .first()
+        .reset_index()
+    )
+    df["Month"] = df["Month"].dt.strftime("%Y-%m")
 
     # Calculate total balance per account across all months for global ordering
     total_balance_per_account = (
-        df.groupby("Account")["Balance"].sum().sort_values(ascending=False)
+        df.groupby("Account", observed=True, sort=False)["Balance"]
+        .sum()
+        .sort_values(ascending=False)
     )
     sorted_accounts = total_balance_per_account.index.tolist()
 
-    # Create a 'Label' column combining Account name and formatted Balance
-    df["Label"] = df.apply(
-        lambda row: f"{row['Account']}: ${row['Balance']/1000:,.0f}k", axis=1
-    )
+    # Balance in thousands for the bar labels, which plotly formats in the browser
+    df["Balance (k)"] = df["Balance"] / 1000
 
     # Plot using Plotly Express
     fig = px.bar(
@@ -500,7 +723,7 @@ def plot_monthly_total_and_account_balances(
         color="Account",
         title="Monthly Total and Account Balances",
         labels={"Balance": "Total Balance", "Month": "Month", "Account": "Account"},
-        text="Label",  # Use the combined label for text
+        custom_data=["Account", "Balance (k)"],  # Feed the label texttemplate
         category_orders={"Account": sorted_accounts},  # Apply global ordering
     )
 
@@ -519,7 +742,8 @@ def plot_monthly_total_and_account_balances(
     # Customize text appearance within the bars
     fig.update_traces(
         textposition="inside",  # Position text inside each bar segment
-        texttemplate="%{text}",  # Use the 'Label' column for text
+        # Label each segment with its Account name and formatted Balance
+        texttemplate="%{customdata[0]}: $%{customdata[1]:,.0f}k",
         insidetextanchor="middle",  # Center the text within the segment
         textfont=dict(color="white", size=10),  # Set text color and size for visibility
     )
@@ -533,9 +757,9 @@ def plot_monthly_total_and_account_balances(
 
 
 def plot_net_worth_over_time(df_resampled_balance_history: pd.DataFrame) -> px.line:
-    net_worth_over_time = (
-        df_resampled_balance_history.groupby("Date")["Balance"].sum().reset_index()
-    )
+    net_worth_over_time = df_resampled_balance_history.groupby("Date", as_index=False)[
+        "Balance"
+    ].sum()
 
     fig = px.line(
         net_worth_over_time,  # Data
@@ -543,6 +767,7 @@ def plot_net_worth_over_time(df_resampled_balance_history: pd.DataFrame) -> px.l
         y="Balance",  # Y-axis
         title="Net Worth Over Time",
         labels={"Balance": "Net Worth", "Date": "Date"},  # Customizing axis labels
+        render_mode="webgl",  # One point per day for years, so draw it on the GPU
     )
 
     # Customize the layout
@@ -558,3 +783,61 @@ def plot_net_worth_over_time(df_resampled_balance_history: pd.DataFrame) -> px.l
     fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor="lightgrey")
 
     return fig
+
+
+def plot_net_worth_combined(
+    df_resampled_balance_history: pd.DataFrame,
+) -> plotly.graph_objs.Figure:
+    """
+    Stacks the monthly account balances and the net worth line into one figure,
+    so the section is serialized and sent to the browser once.
+
+    Args:
+        df_resampled_balance_history (pd.DataFrame): The resampled balance history.
+
+    Returns:
+        plotly.graph_objs.Figure: The resulting Plotly figure.
+    """
+    balances = plot_monthly_total_and_account_balances(df_resampled_balance_history)
+    net_worth = plot_net_worth_over_time(df_resampled_balance_history)
+
+    # The balances x-axis is categorical months and the net worth one is dates,
+    # so the two subplots keep separate x-axes
+    fig = make_subplots(
+        rows=2,
+        cols=1,
+        vertical_spacing=0.15,
+        subplot_titles=(balances.layout.title.text, net_worth.layout.title.text),
+    )
+    for trace in balances.data:
+        fig.add_trace(trace, row=1, col=1)
+    for trace in net_worth.data:
+        fig.add_trace(trace, row=2, col=1)
+
+    fig.update_layout(
+        barmode="stack",
+        legend_title="Account",
+        height=1000,
+        margin=dict(l=40, r=40, t=80, b=80),
+    )
+    fig.update_xaxes(type="category", tickangle=-45, title_text="Month", row=1, col=1)
+    fig.update_yaxes(title_text="Total Balance", row=1, col=1)
+    fig.update_xaxes(
+        tickangle=-45,
+        title_text="Date",
+        showgrid=True,
+        gridwidth=1,
+        gridcolor="lightgrey",
+        row=2,
+        col=1,
+    )
+    fig.update_yaxes(
+        title_text="Net Worth",
+        range=net_worth.layout.yaxis.range,
+        showgrid=True,
+        gridwidth=1,
+        gridcolor="lightgrey",
+        row=2,
+        col=1,
+    )
+    return fig